@@ -0,0 +1,221 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+# Token buckets for routes that open a DB connection per call and are easy to
+# hammer: (method, path) -> (burst capacity, tokens refilled per second)
+RATE_LIMITED_ROUTES = {
+    ('POST', '/students/login'): (5, 5 / 60),
+    ('POST', '/orgs/login'): (5, 5 / 60),
+    ('POST', '/students-events/pu'): (10, 1),
+    ('DELETE', '/students-events/pu'): (10, 1),
+}
+
+# Upper bound on tracked (client, route) buckets before LRU eviction
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 10000))
+# In-flight requests allowed past the gate before returning 503. Only
+# meaningful with the shared backend: a Lambda container serves one request at
+# a time, so the local count never exceeds 1. Without Redis, cap concurrency
+# with the function's reserved concurrency instead.
+MAX_CONCURRENT_REQUESTS = int(os.environ.get('MAX_CONCURRENT_REQUESTS', 50))
+# A shared slot expires after this long even if never released, e.g. when the
+# Lambda times out; keep it at or above the function timeout
+SLOT_TTL_SECONDS = float(os.environ.get('SLOT_TTL_SECONDS', 30))
+# DB connection failures within the window that switch on load shedding
+SHED_FAILURE_THRESHOLD = int(os.environ.get('SHED_FAILURE_THRESHOLD', 3))
+SHED_FAILURE_WINDOW_SECONDS = float(os.environ.get('SHED_FAILURE_WINDOW_SECONDS', 10))
+SHED_COOLDOWN_SECONDS = float(os.environ.get('SHED_COOLDOWN_SECONDS', 5))
+# Optional shared backend so limits hold across Lambda containers
+RATE_LIMIT_REDIS_URL = os.environ.get('RATE_LIMIT_REDIS_URL')
+# After a shared backend error, skip it for this long instead of paying its
+# socket timeout on every call
+BACKEND_RETRY_SECONDS = float(os.environ.get('BACKEND_RETRY_SECONDS', 30))
+
+
+# In-process backend; also the stand-in for the shared backend in tests
+class LocalBackend:
+
+    def __init__(self, max_keys=RATE_LIMIT_MAX_KEYS, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self.buckets = OrderedDict()
+        self.in_flight = 0
+        self.lock = threading.Lock()
+
+    # Returns seconds to wait before a token is available, 0 if one was taken
+    def take_token(self, key, capacity, refill_rate):
+        with self.lock:
+            now = self.clock()
+            tokens, updated = self.buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_rate)
+
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / refill_rate
+
+            self.buckets[key] = (tokens, now)
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+            return wait
+
+    # Returns a slot id to release later, or None if the gate is full
+    def acquire_slot(self, limit):
+        with self.lock:
+            if self.in_flight >= limit:
+                return None
+            self.in_flight += 1
+            return str(uuid.uuid4())
+
+    def release_slot(self, slot_id):
+        with self.lock:
+            self.in_flight = max(self.in_flight - 1, 0)
+
+
+# Redis-backed buckets and in-flight counter shared by every container
+class RedisBackend:
+
+    TOKEN_SCRIPT = """
+        local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens') or ARGV[1])
+        local updated = tonumber(redis.call('HGET', KEYS[1], 'updated') or ARGV[3])
+        tokens = math.min(tonumber(ARGV[1]), tokens + (tonumber(ARGV[3]) - updated) * tonumber(ARGV[2]))
+        local wait = 0
+        if tokens >= 1 then
+            tokens = tokens - 1
+        else
+            wait = (1 - tokens) / tonumber(ARGV[2])
+        end
+        redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', ARGV[3])
+        redis.call('EXPIRE', KEYS[1], ARGV[4])
+        return tostring(wait)
+    """
+    # In-flight requests are ZSET members scored by their deadline, so slots
+    # lost to a timed-out container expire on their own
+    SLOT_SCRIPT = """
+        redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+        if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[2]) then
+            return 0
+        end
+        redis.call('ZADD', KEYS[1], ARGV[3], ARGV[4])
+        redis.call('EXPIRE', KEYS[1], ARGV[5])
+        return 1
+    """
+    SLOT_KEY = 'ratelimit:in_flight'
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url, socket_timeout=0.2)
+        self.take_script = self.client.register_script(self.TOKEN_SCRIPT)
+        self.slot_script = self.client.register_script(self.SLOT_SCRIPT)
+
+    def take_token(self, key, capacity, refill_rate):
+        # Keys expire once a full bucket would have refilled, bounding memory
+        ttl = int(capacity / refill_rate) + 1
+        wait = self.take_script(
+            keys=[f'ratelimit:{key}'],
+            args=[capacity, refill_rate, time.time(), ttl]
+        )
+        return float(wait)
+
+    def acquire_slot(self, limit):
+        slot_id = str(uuid.uuid4())
+        now = time.time()
+        granted = self.slot_script(
+            keys=[self.SLOT_KEY],
+            args=[now, limit, now + SLOT_TTL_SECONDS, slot_id, int(SLOT_TTL_SECONDS) + 1]
+        )
+        return slot_id if granted else None
+
+    def release_slot(self, slot_id):
+        self.client.zrem(self.SLOT_KEY, slot_id)
+
+
+class RateLimiter:
+
+    def __init__(self, backend=None, clock=time.monotonic):
+        self.backend = backend or LocalBackend(clock=clock)
+        self.fallback = LocalBackend(clock=clock)
+        self.clock = clock
+        self.backend_down_until = 0
+        self.db_failures = deque()
+        self.shed_until = 0
+        self.lock = threading.Lock()
+
+    # Pick the shared backend unless it failed recently
+    def _active_backend(self):
+        if self.backend is not self.fallback and self.clock() < self.backend_down_until:
+            return self.fallback
+        return self.backend
+
+    # Run a backend call, degrading to local state if the shared store is down.
+    # Returns the backend that served the call along with its result.
+    def _call(self, name, *args):
+        backend = self._active_backend()
+        try:
+            return backend, getattr(backend, name)(*args)
+        except Exception as e:
+            if backend is self.fallback:
+                raise
+            print(f"Rate limit backend error, using local state for {BACKEND_RETRY_SECONDS}s: {str(e)}")
+            self.backend_down_until = self.clock() + BACKEND_RETRY_SECONDS
+            return self.fallback, getattr(self.fallback, name)(*args)
+
+    # Returns seconds until the client may retry, 0 if the request is allowed
+    def check_rate(self, client_key, method, path):
+        limits = RATE_LIMITED_ROUTES.get((method, path))
+        if not limits or not client_key:
+            return 0
+        capacity, refill_rate = limits
+        return self._call('take_token', f'{client_key}:{method}:{path}', capacity, refill_rate)[1]
+
+    # Returns seconds until load shedding lifts, 0 if not shedding
+    def shed_remaining(self):
+        return max(self.shed_until - self.clock(), 0)
+
+    def record_db_failure(self):
+        with self.lock:
+            now = self.clock()
+            self.db_failures.append(now)
+            while self.db_failures and now - self.db_failures[0] > SHED_FAILURE_WINDOW_SECONDS:
+                self.db_failures.popleft()
+
+            if len(self.db_failures) >= SHED_FAILURE_THRESHOLD:
+                self.shed_until = now + SHED_COOLDOWN_SECONDS
+                self.db_failures.clear()
+                print(f"Shedding load for {SHED_COOLDOWN_SECONDS}s after repeated DB connection failures")
+
+    # Returns a (backend, slot id) grant for release_slot, or None if full
+    def acquire_slot(self):
+        backend, slot_id = self._call('acquire_slot', MAX_CONCURRENT_REQUESTS)
+        if slot_id is None:
+            return None
+        return backend, slot_id
+
+    # Release on the backend that granted the slot, whatever is active now
+    def release_slot(self, grant):
+        backend, slot_id = grant
+        try:
+            backend.release_slot(slot_id)
+        except Exception as e:
+            # The shared slot expires on its own after SLOT_TTL_SECONDS
+            print(f"Could not release rate limit slot: {str(e)}")
+
+
+def create_rate_limiter():
+    if RATE_LIMIT_REDIS_URL:
+        try:
+            return RateLimiter(RedisBackend(RATE_LIMIT_REDIS_URL))
+        except Exception as e:
+            print(f"Could not set up shared rate limit backend: {str(e)}")
+    return RateLimiter()
+
+
+# API Gateway sets sourceIp itself; X-Forwarded-For is client-controlled and
+# would let callers pick a fresh bucket per request. Events without it (direct
+# invokes) are not rate limited per client.
+def get_client_key(event):
+    identity = (event.get('requestContext') or {}).get('identity') or {}
+    return identity.get('sourceIp')
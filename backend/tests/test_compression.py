@@ -0,0 +1,78 @@
+import base64
+import gzip
+import json
+
+import pytest
+
+import lambda_function
+
+
+@pytest.fixture(autouse=True)
+def compression_enabled(monkeypatch):
+    monkeypatch.setattr(lambda_function, 'COMPRESSION_ENABLED', True)
+    monkeypatch.setattr(lambda_function, 'COMPRESSION_MIN_BYTES', 1024)
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('gzip', True),
+    ('GZIP', True),
+    ('deflate, gzip;q=0.5', True),
+    ('*', True),
+    ('*;q=0, gzip', True),
+    ('gzip;q=0', False),
+    ('gzip;Q=0', False),
+    ('gzip;q=0, *', False),
+    ('br', False),
+    ('', False),
+    (None, False),
+])
+def test_accepts_gzip(header, expected):
+    assert lambda_function.accepts_gzip(header) is expected
+
+
+def test_large_body_is_compressed():
+    body = {'events': [{'description': 'free pizza ' * 10, 'event_id': i} for i in range(50)]}
+    response = lambda_function.compress_response(lambda_function.build_response(200, body), 'gzip')
+
+    assert response['isBase64Encoded'] is True
+    assert response['headers']['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(base64.b64decode(response['body']))) == body
+
+    raw_length = int(response['headers']['X-Uncompressed-Length'])
+    saved = int(response['headers']['X-Compression-Saved-Bytes'])
+    assert raw_length == len(json.dumps(body))
+    assert saved == raw_length - len(base64.b64decode(response['body']))
+    assert 'X-Compression-Saved-Bytes' in response['headers']['Access-Control-Expose-Headers']
+
+
+def test_small_body_is_not_compressed():
+    response = lambda_function.compress_response(lambda_function.build_response(200, {'message': 'ok'}), 'gzip')
+
+    assert 'isBase64Encoded' not in response
+    assert response['body'] == '{"message": "ok"}'
+    assert response['headers']['Vary'] == 'Accept-Encoding'
+
+
+def test_body_without_gain_is_not_compressed(monkeypatch):
+    monkeypatch.setattr(lambda_function, 'COMPRESSION_MIN_BYTES', 0)
+    response = lambda_function.compress_response(lambda_function.build_response(200, 'a'), 'gzip')
+
+    assert 'isBase64Encoded' not in response
+    assert response['body'] == '"a"'
+
+
+def test_client_without_gzip_gets_plain_body():
+    body = {'description': 'x' * 4096}
+    response = lambda_function.compress_response(lambda_function.build_response(200, body), 'gzip;q=0')
+
+    assert 'isBase64Encoded' not in response
+    assert json.loads(response['body']) == body
+
+
+def test_compression_disabled(monkeypatch):
+    monkeypatch.setattr(lambda_function, 'COMPRESSION_ENABLED', False)
+    response = lambda_function.compress_response(
+        lambda_function.build_response(200, {'description': 'x' * 4096}), 'gzip')
+
+    assert 'isBase64Encoded' not in response
+    assert 'Vary' not in response['headers']
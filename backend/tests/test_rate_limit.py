@@ -0,0 +1,189 @@
+import pytest
+
+import lambda_function
+import rate_limit
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+# Shared backend stand-in that is unreachable until told otherwise
+class FailingBackend(rate_limit.LocalBackend):
+
+    def __init__(self, clock):
+        super().__init__(clock=clock)
+        self.down = True
+        self.calls = 0
+
+    def take_token(self, key, capacity, refill_rate):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError('redis unreachable')
+        return super().take_token(key, capacity, refill_rate)
+
+    def acquire_slot(self, limit):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError('redis unreachable')
+        return super().acquire_slot(limit)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def limiter(clock, monkeypatch):
+    limiter = rate_limit.RateLimiter(rate_limit.LocalBackend(clock=clock), clock=clock)
+    monkeypatch.setattr(lambda_function, 'rate_limiter', limiter)
+    return limiter
+
+
+@pytest.fixture
+def no_db(monkeypatch):
+    def fail():
+        raise AssertionError('get_db_connection should not be called')
+    monkeypatch.setattr(lambda_function, 'get_db_connection', fail)
+
+
+def login_event(ip='1.2.3.4'):
+    return {
+        'httpMethod': 'POST',
+        'path': '/students/login',
+        'body': '{"email": "a@stanford.edu", "password": "x"}',
+        'requestContext': {'identity': {'sourceIp': ip}},
+    }
+
+
+def test_bucket_allows_burst_then_refills(clock, limiter):
+    for _ in range(5):
+        assert limiter.check_rate('1.2.3.4', 'POST', '/students/login') == 0
+
+    # 5 tokens per minute: the next token is 12 seconds away
+    assert limiter.check_rate('1.2.3.4', 'POST', '/students/login') == pytest.approx(12)
+
+    clock.now += 6
+    assert limiter.check_rate('1.2.3.4', 'POST', '/students/login') == pytest.approx(6)
+
+    clock.now += 6
+    assert limiter.check_rate('1.2.3.4', 'POST', '/students/login') == 0
+
+
+def test_buckets_are_per_client_and_route(limiter):
+    for _ in range(5):
+        limiter.check_rate('1.2.3.4', 'POST', '/students/login')
+
+    assert limiter.check_rate('1.2.3.4', 'POST', '/students/login') > 0
+    assert limiter.check_rate('5.6.7.8', 'POST', '/students/login') == 0
+    assert limiter.check_rate('1.2.3.4', 'POST', '/orgs/login') == 0
+    assert limiter.check_rate('1.2.3.4', 'GET', '/events') == 0
+
+
+def test_bucket_state_is_bounded(clock):
+    backend = rate_limit.LocalBackend(max_keys=3, clock=clock)
+    for key in ['a', 'b', 'c']:
+        backend.take_token(key, 1, 1)
+    backend.take_token('a', 1, 1)
+    backend.take_token('d', 1, 1)
+
+    # 'b' was least recently used
+    assert list(backend.buckets) == ['c', 'a', 'd']
+
+
+def test_client_key_ignores_forwarded_for():
+    event = {'headers': {'X-Forwarded-For': '9.9.9.9, 1.2.3.4'}}
+    assert rate_limit.get_client_key(event) is None
+
+    event['requestContext'] = {'identity': {'sourceIp': '1.2.3.4'}}
+    assert rate_limit.get_client_key(event) == '1.2.3.4'
+
+
+def test_repeated_db_failures_shed_load(clock, limiter):
+    limiter.record_db_failure()
+    clock.now += 11
+    limiter.record_db_failure()
+    limiter.record_db_failure()
+    assert limiter.shed_remaining() == 0
+
+    limiter.record_db_failure()
+    assert limiter.shed_remaining() == pytest.approx(rate_limit.SHED_COOLDOWN_SECONDS)
+
+    clock.now += rate_limit.SHED_COOLDOWN_SECONDS
+    assert limiter.shed_remaining() == 0
+
+
+def test_rate_limited_login_returns_429_before_db(limiter, no_db, monkeypatch):
+    monkeypatch.setattr(lambda_function, 'check_student_password',
+                        lambda body: lambda_function.build_response(200, {}))
+    for _ in range(5):
+        assert lambda_function.lambda_handler(login_event(), None)['statusCode'] == 200
+
+    response = lambda_function.lambda_handler(login_event(), None)
+    assert response['statusCode'] == 429
+    assert response['headers']['Retry-After'] == '12'
+
+
+def test_shedding_returns_503_before_db(limiter, no_db):
+    for _ in range(rate_limit.SHED_FAILURE_THRESHOLD):
+        limiter.record_db_failure()
+
+    response = lambda_function.lambda_handler(login_event(), None)
+    assert response['statusCode'] == 503
+    assert response['headers']['Retry-After'] == str(int(rate_limit.SHED_COOLDOWN_SECONDS))
+
+
+def test_full_gate_returns_503_before_db(limiter, no_db, monkeypatch):
+    monkeypatch.setattr(rate_limit, 'MAX_CONCURRENT_REQUESTS', 1)
+    slot = limiter.acquire_slot()
+
+    assert lambda_function.lambda_handler(login_event(), None)['statusCode'] == 503
+
+    limiter.release_slot(slot)
+    assert limiter.backend.in_flight == 0
+
+
+def test_slot_is_released_after_request(limiter, monkeypatch):
+    monkeypatch.setattr(lambda_function, 'route_request',
+                        lambda event: lambda_function.build_response(200, {}))
+    lambda_function.lambda_handler(login_event(), None)
+
+    assert limiter.backend.in_flight == 0
+
+
+def test_failed_backend_falls_back_and_is_skipped(clock):
+    backend = FailingBackend(clock)
+    limiter = rate_limit.RateLimiter(backend, clock=clock)
+
+    assert limiter.check_rate('1.2.3.4', 'POST', '/students/login') == 0
+    assert limiter.check_rate('1.2.3.4', 'POST', '/students/login') == 0
+    assert backend.calls == 1
+
+    backend.down = False
+    clock.now += rate_limit.BACKEND_RETRY_SECONDS
+    limiter.check_rate('1.2.3.4', 'POST', '/students/login')
+    assert backend.calls == 2
+
+
+def test_slot_is_released_on_granting_backend(clock):
+    backend = FailingBackend(clock)
+    limiter = rate_limit.RateLimiter(backend, clock=clock)
+
+    slot = limiter.acquire_slot()
+    assert limiter.fallback.in_flight == 1
+
+    # The shared backend recovers before the request finishes
+    backend.down = False
+    clock.now += rate_limit.BACKEND_RETRY_SECONDS
+    other = limiter.acquire_slot()
+    assert other[0] is backend
+    limiter.release_slot(slot)
+
+    assert limiter.fallback.in_flight == 0
+    assert backend.in_flight == 1